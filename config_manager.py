@@ -4,70 +4,274 @@ Configuration management tool for multi-environment infrastructure.
 This script provides a CLI to validate, generate, and compare configuration
 files for different deployment environments (e.g., dev, staging, prod).
 """
+import copy
+import functools
 import json
+import os
+from collections.abc import Hashable
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
 import click
 import yaml
-from jsonschema import validate as jsonschema_validate, ValidationError
-from deepdiff import DeepDiff
+
+# Prefer the libyaml-backed loader (requires PyYAML built with C extensions,
+# i.e. libyaml-dev at install time); fall back to the pure-Python one.
+try:
+    from yaml import CSafeLoader as _SafeLoader
+except ImportError:
+    from yaml import SafeLoader as _SafeLoader
+
+# orjson is an optional C-level JSON encoder/decoder; the CLI works without
+# it, falling back to the stdlib json module.
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 CONFIG_DIR = Path("configs")
 SCHEMA_FILE = Path("schemas/config_schema.json")
 GENERATED_DIR = Path("generated_configs")
-ENVIRONMENTS = ["dev", "staging", "prod"]
+ENVIRONMENTS = ("dev", "staging", "prod")
+_ENV_SET = frozenset(ENVIRONMENTS)
+# One Choice instance shared by every command decorator instead of rebuilding
+# it per argument.
+_ENV_CHOICE = click.Choice(ENVIRONMENTS)
+
+# Shared default for config.get() lookups; an empty tuple is immutable so it
+# can be reused without allocating a fresh list per call.
+_EMPTY = ()
+
+def _merge_list(source_list, dest_list):
+    """
+    Merges a source list into a destination list, pairing dict items by 'name'.
+
+    Matched named items are merged eagerly so that later source items with the
+    same name see (and override) the effects of earlier ones, matching the
+    original depth-first merge order.
+    """
+    if not source_list:
+        return
+    # Index the destination list once so each incoming item is matched in
+    # O(1) instead of rescanning the whole list per item. setdefault keeps
+    # the first occurrence of a duplicated name, matching the original
+    # linear scan.
+    dest_by_name = {}
+    for d in dest_list:
+        if isinstance(d, dict) and 'name' in d:
+            dest_by_name.setdefault(d['name'], d)
+    seen = {d for d in dest_list if isinstance(d, Hashable)}
+    for item in source_list:
+        if isinstance(item, dict) and 'name' in item:
+            # Find and update item in destination list by name
+            dest_item = dest_by_name.get(item['name'])
+            if dest_item is not None:
+                deep_merge(item, dest_item)
+            else:
+                dest_list.append(item)
+                dest_by_name[item['name']] = item
+        elif isinstance(item, Hashable):
+            # Simple append for lists without named items
+            if item not in seen:
+                dest_list.append(item)
+                seen.add(item)
+        else:
+            if item not in dest_list:
+                dest_list.append(item)
 
 def deep_merge(source, destination):
     """
     Deeply merges two dictionaries. Arrays are merged based on a 'name' key.
+
+    Dict nesting is walked with an explicit stack of (source, destination)
+    pairs instead of recursion, so deeply nested configs pay no per-level call
+    overhead; only matched named list items re-enter deep_merge, to keep the
+    original in-order depth-first semantics.
+    """
+    stack = [(source, destination)]
+    while stack:
+        src, dst = stack.pop()
+        for key, value in src.items():
+            if isinstance(value, dict):
+                stack.append((value, dst.setdefault(key, {})))
+            elif isinstance(value, list):
+                _merge_list(value, dst.setdefault(key, []))
+            else:
+                dst[key] = value
+    return destination
+
+def _is_named_list(lst):
+    """True if every element is a dict keyed by 'name' (the deep_merge contract)."""
+    return all(isinstance(item, dict) and 'name' in item for item in lst)
+
+def structural_diff(a, b, path=""):
+    """
+    Recursively compares two configuration trees, yielding (op, path, old, new)
+    tuples where op is 'changed', 'added', or 'removed'.
+
+    Lists whose elements are dicts with a 'name' key are paired by name,
+    mirroring the deep_merge contract, so item order never produces spurious
+    differences.
     """
-    for key, value in source.items():
-        if isinstance(value, dict):
-            node = destination.setdefault(key, {})
-            deep_merge(value, node)
-        elif isinstance(value, list):
-            dest_list = destination.setdefault(key, [])
-            for item in value:
-                if isinstance(item, dict) and 'name' in item:
-                    # Find and update item in destination list by name
-                    dest_item = next((i for i in dest_list if i.get('name') == item['name']), None)
-                    if dest_item:
-                        deep_merge(item, dest_item)
-                    else:
-                        dest_list.append(item)
+    if isinstance(a, dict) and isinstance(b, dict):
+        for key in sorted(set(a) | set(b), key=str):
+            child = f"{path}.{key}" if path else str(key)
+            if key not in a:
+                yield ('added', child, None, b[key])
+            elif key not in b:
+                yield ('removed', child, a[key], None)
+            else:
+                yield from structural_diff(a[key], b[key], child)
+    elif isinstance(a, list) and isinstance(b, list):
+        if _is_named_list(a) and _is_named_list(b):
+            a_by_name = {item['name']: item for item in a}
+            b_by_name = {item['name']: item for item in b}
+            for name in sorted(set(a_by_name) | set(b_by_name), key=str):
+                child = f"{path}[{name}]"
+                if name not in a_by_name:
+                    yield ('added', child, None, b_by_name[name])
+                elif name not in b_by_name:
+                    yield ('removed', child, a_by_name[name], None)
                 else:
-                    # Simple append for lists without named items
-                    if item not in dest_list:
-                        dest_list.append(item)
+                    yield from structural_diff(a_by_name[name], b_by_name[name], child)
         else:
-            destination[key] = value
-    return destination
+            for i in range(max(len(a), len(b))):
+                child = f"{path}[{i}]"
+                if i >= len(a):
+                    yield ('added', child, None, b[i])
+                elif i >= len(b):
+                    yield ('removed', child, a[i], None)
+                else:
+                    yield from structural_diff(a[i], b[i], child)
+    elif a != b:
+        yield ('changed', path, a, b)
+
+@functools.lru_cache(maxsize=None)
+def _load_yaml_cached(path_str, mtime_ns, size):
+    """
+    Parses a YAML file, memoized on (path, mtime, size) so repeated loads of
+    an unchanged file within one process parse only once.
+
+    Reads the file in a single bulk call and parses from memory; libyaml
+    consumes the bytes directly, skipping text decoding and chunked reads.
+    """
+    try:
+        return yaml.load(Path(path_str).read_bytes(), Loader=_SafeLoader)
+    except yaml.YAMLError as e:
+        # Parsing from bytes loses the file name in the error's context
+        # marks ("<byte string>"); prepend the path so the user can tell
+        # which file is broken.
+        raise yaml.YAMLError(f"{path_str}: {e}") from e
+
+def _stat_key(path):
+    """Returns the (mtime_ns, size) cache key for a config file."""
+    st = path.stat()
+    return (st.st_mtime_ns, st.st_size)
+
+@functools.lru_cache(maxsize=None)
+def _load_merged(env, base_key, env_key):
+    """Builds the merged base+env configuration, memoized per file state."""
+    base_path = CONFIG_DIR / "base.yaml"
+    config = copy.deepcopy(_load_yaml_cached(str(base_path), *base_key) or {})
+
+    if env_key is not None:
+        env_path = CONFIG_DIR / f"{env}.yaml"
+        env_config = _load_yaml_cached(str(env_path), *env_key) or {}
+        config = deep_merge(env_config, config)
+
+    return config
 
 def load_config(env):
     """Loads and merges configuration for a given environment."""
-    if env not in ENVIRONMENTS:
-        raise click.ClickException(f"Invalid environment '{env}'. Must be one of {ENVIRONMENTS}")
+    if env not in _ENV_SET:
+        raise click.ClickException(f"Invalid environment '{env}'. Must be one of {list(ENVIRONMENTS)}")
 
-    base_config_path = CONFIG_DIR / "base.yaml"
-    with open(base_config_path, 'r', encoding="utf-8") as f:
-        config = yaml.safe_load(f) or {}
+    base_key = _stat_key(CONFIG_DIR / "base.yaml")
+    # Probe the env file with the same stat that feeds the cache key rather
+    # than a separate exists() check — one syscall, no race window.
+    try:
+        env_key = _stat_key(CONFIG_DIR / f"{env}.yaml")
+    except FileNotFoundError:
+        env_key = None
 
-    env_config_path = CONFIG_DIR / f"{env}.yaml"
-    if env_config_path.exists():
-        with open(env_config_path, 'r', encoding="utf-8") as f:
-            env_config = yaml.safe_load(f) or {}
-            config = deep_merge(env_config, config)
+    # Deep-copy on the way out: callers (and deep_merge itself) treat the
+    # config as mutable, and the cached trees must stay pristine.
+    return copy.deepcopy(_load_merged(env, base_key, env_key))
 
-    return config
+ALLOWED_DEV_TYPES = frozenset({"t3.micro", "t3.small"})
+
+def _project_instances(instances):
+    """
+    Projects a list of instance dicts into parallel columns
+    (names, instance_types, security-group lists) so rule checks can scan
+    them with single comprehensions instead of per-dict key lookups.
+    """
+    return (
+        [i['name'] for i in instances],
+        [i.get('instance_type') for i in instances],
+        [i.get('security_groups') or _EMPTY for i in instances],
+    )
+
+def _check_dev_instance_types(config, env):
+    """Rule: Enforce cheaper instance types in 'dev' (Environment-specific policy)."""
+    names, types, _ = _project_instances(config.get("compute_instances", _EMPTY))
+    bad = [(n, t) for n, t in zip(names, types) if t not in ALLOWED_DEV_TYPES]
+    if bad:
+        name, instance_type = bad[0]
+        raise click.ClickException(
+            f"Validation Error in '{env}': Instance '{name}' has type "
+            f"'{instance_type}'. Must be one of {sorted(ALLOWED_DEV_TYPES)}."
+        )
+
+def _check_prod_db_public(config, env):
+    """Rule: Production databases must not be publicly accessible."""
+    for db in config.get("databases", _EMPTY):
+        if db.get("publicly_accessible"):
+            raise click.ClickException(
+                f"Validation Error in '{env}': Production database '{db['name']}' "
+                "cannot be publicly accessible."
+            )
+
+def _check_prod_db_retention(config, env):
+    """Rule: Production databases need at least 30 days of backups."""
+    for db in config.get("databases", _EMPTY):
+        if db.get("backup_retention_period", 0) < 30:
+            raise click.ClickException(
+                f"Validation Error in '{env}': Production database '{db['name']}' "
+                "backup retention must be >= 30 days."
+            )
+
+# Environment-specific rules, dispatched by a single dict lookup instead of
+# re-branching on env inside validate_config.
+_RULES = {
+    "dev": (_check_dev_instance_types,),
+    "prod": (_check_prod_db_public, _check_prod_db_retention),
+}
+
+@functools.lru_cache(maxsize=1)
+def _get_validator():
+    """Builds the JSON schema validator once per process and reuses it."""
+    # Deferred import: jsonschema is only needed once validation actually
+    # runs, and pulling it in at module scope slows down every CLI start.
+    from jsonschema.validators import validator_for
+
+    schema_bytes = SCHEMA_FILE.read_bytes()
+    schema = orjson.loads(schema_bytes) if orjson else json.loads(schema_bytes)
+    # Pick the validator class from the schema's own $schema declaration,
+    # like jsonschema.validate does, rather than pinning a draft.
+    validator_cls = validator_for(schema)
+    validator_cls.check_schema(schema)
+    return validator_cls(schema)
 
 def validate_config(config, env):
     """Validates the configuration against the JSON schema and custom rules."""
     # 1. JSON Schema Validation
-    with open(SCHEMA_FILE, 'r', encoding="utf-8") as f:
-        schema = json.load(f)
-    try:
-        jsonschema_validate(instance=config, schema=schema)
-    except ValidationError as e:
+    # is_valid short-circuits on the first failure without building error
+    # objects, so the common passing case skips that allocation entirely;
+    # only an invalid config pays for the error walk.
+    validator = _get_validator()
+    if not validator.is_valid(config):
+        e = next(validator.iter_errors(config))
         # Format the path to be more readable, e.g., "compute_instances[0].replicas"
         path = ".".join(str(p) for p in e.path)
         raise click.ClickException(
@@ -76,42 +280,43 @@ def validate_config(config, env):
 
     # 2. Custom Validation Rules
     # Rule: Ensure attached security groups are actually defined (Cross-resource validation)
-    defined_sec_groups = {sg['name'] for sg in config.get("security_groups", [])}
-
-    for instance in config.get("compute_instances", []):
-        for attached_sg in instance.get("security_groups", []):
-            if attached_sg not in defined_sec_groups:
-                raise click.ClickException(
-                    f"Validation Error in '{env}': Instance '{instance['name']}' "
-                    f"uses undefined security group '{attached_sg}'."
-                )
-
-    # Rule: Enforce cheaper instance types in 'dev' (Environment-specific policy)
-    if env == "dev":
-        allowed_dev_types = ["t3.micro", "t3.small"]
-        for instance in config.get("compute_instances", []):
-            if instance.get("instance_type") not in allowed_dev_types:
-                raise click.ClickException(
-                    f"Validation Error in '{env}': Instance '{instance['name']}' has type "
-                    f"'{instance.get('instance_type')}'. Must be one of {allowed_dev_types}."
-                )
+    instances = config.get("compute_instances") or _EMPTY
+    if instances:
+        # Only built when there are instances to check against.
+        defined_sec_groups = frozenset(
+            sg['name'] for sg in config.get("security_groups", _EMPTY)
+        )
+        names, _, sg_lists = _project_instances(instances)
+        undefined = [
+            (name, sg)
+            for name, sgs in zip(names, sg_lists)
+            for sg in sgs
+            if sg not in defined_sec_groups
+        ]
+        if undefined:
+            name, attached_sg = undefined[0]
+            raise click.ClickException(
+                f"Validation Error in '{env}': Instance '{name}' "
+                f"uses undefined security group '{attached_sg}'."
+            )
 
-    # Rule: Production-specific hardening
-    if env == "prod":
-        for db in config.get("databases", []):
-            if db.get("publicly_accessible"):
-                raise click.ClickException(
-                    f"Validation Error in '{env}': Production database '{db['name']}' "
-                    "cannot be publicly accessible."
-                )
-            if db.get("backup_retention_period", 0) < 30:
-                raise click.ClickException(
-                    f"Validation Error in '{env}': Production database '{db['name']}' "
-                    "backup retention must be >= 30 days."
-                )
+    # Environment-specific rules (see _RULES)
+    for rule in _RULES.get(env, ()):
+        rule(config, env)
 
+def _validate_one(env):
+    """
+    Validates a single environment and returns an (ok, message) tuple.
 
-    click.secho(f"Configuration for '{env}' is valid.", fg="green")
+    Kept free of terminal output so it can run in a worker process; the
+    parent prints results in the order environments were given.
+    """
+    try:
+        config = load_config(env)
+        validate_config(config, env)
+    except (click.ClickException, FileNotFoundError, yaml.YAMLError) as e:
+        return False, str(e)
+    return True, f"Configuration for '{env}' is valid."
 
 @click.group()
 def cli():
@@ -124,69 +329,109 @@ def validate(environments):
     if not environments:
         environments = ENVIRONMENTS
 
-    for env in environments:
-        try:
-            config = load_config(env)
-            validate_config(config, env)
-        except (click.ClickException, FileNotFoundError, yaml.YAMLError) as e:
-            click.secho(str(e), fg="red")
-            continue
+    if len(environments) > 1:
+        # Each environment is independent I/O plus schema and rule checks,
+        # so fan out one worker per environment. The schema validator is
+        # built lazily inside each worker rather than in a pool initializer:
+        # an initializer failure (e.g. missing schema file) would kill every
+        # worker and surface as a raw BrokenProcessPool, while inside
+        # _validate_one it is reported cleanly per environment.
+        with ProcessPoolExecutor(max_workers=len(environments)) as executor:
+            results = executor.map(_validate_one, environments)
+    else:
+        results = map(_validate_one, environments)
+
+    for ok, message in results:
+        click.secho(message, fg="green" if ok else "red")
 
 @cli.command()
-@click.argument("env", type=click.Choice(ENVIRONMENTS))
+@click.argument("env", type=_ENV_CHOICE)
 def generate(env):
     """Generates a .tfvars.json file for a specific environment."""
     try:
         config = load_config(env)
         validate_config(config, env)
+        click.secho(f"Configuration for '{env}' is valid.", fg="green")
 
         GENERATED_DIR.mkdir(exist_ok=True)
         output_path = GENERATED_DIR / f"{env}.tfvars.json"
 
-        with open(output_path, 'w', encoding="utf-8") as f:
-            json.dump(config, f, indent=2)
+        # Serialize once in memory; keys are sorted so the output is stable
+        # across runs, and non-string keys (legal in YAML mappings) are
+        # coerced to strings like the stdlib encoder does.
+        if orjson:
+            data = orjson.dumps(
+                config,
+                option=orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS,
+            )
+        else:
+            try:
+                text = json.dumps(config, indent=2, sort_keys=True)
+            except TypeError:
+                # Mixed-type keys cannot be sorted; emit unsorted rather
+                # than fail the write.
+                text = json.dumps(config, indent=2)
+            data = text.encode("utf-8")
+
+        # Write to a sibling temp file and rename into place so a crash
+        # mid-write can never leave a torn tfvars file for CI to consume.
+        tmp_path = output_path.with_name(output_path.name + ".tmp")
+        try:
+            tmp_path.write_bytes(data)
+            os.replace(tmp_path, output_path)
+        finally:
+            tmp_path.unlink(missing_ok=True)
 
         click.secho(f"Successfully generated '{output_path}' for '{env}'.", fg="green")
     except (click.ClickException, FileNotFoundError, yaml.YAMLError) as e:
         click.secho(str(e), fg="red")
 
 @cli.command()
-@click.argument("env1", type=click.Choice(ENVIRONMENTS))
-@click.argument("env2", type=click.Choice(ENVIRONMENTS))
+@click.argument("env1", type=_ENV_CHOICE)
+@click.argument("env2", type=_ENV_CHOICE)
 def diff(env1, env2):
     """Shows the difference between two environments."""
     try:
         config1 = load_config(env1)
         config2 = load_config(env2)
 
-        diff_result = DeepDiff(config1, config2, ignore_order=True, view='tree')
+        # Cheap pre-check: byte-compare canonical serializations so the
+        # common identical-config case (e.g. staging vs prod right after a
+        # promotion) skips the structural walk entirely. Key order is
+        # normalized by OPT_SORT_KEYS; list order is already canonical from
+        # deep_merge's name-keyed merge. Anything orjson cannot encode falls
+        # back to plain equality — the fast path must never be stricter than
+        # structural_diff itself.
+        if orjson:
+            opt = orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS
+            try:
+                identical = (
+                    orjson.dumps(config1, option=opt) == orjson.dumps(config2, option=opt)
+                )
+            except TypeError:
+                identical = config1 == config2
+        else:
+            identical = config1 == config2
+
+        changes = [] if identical else list(structural_diff(config1, config2))
 
-        if not diff_result:
+        if not changes:
             click.secho(f"No differences found between '{env1}' and '{env2}'.", fg="yellow")
             return
 
         click.secho(f"Differences between '{env1}' (left) and '{env2}' (right):", bold=True)
 
-        # Helper to format the path from DeepDiff for readability
-        def format_path(path_obj):
-            return path_obj.replace("root", "").replace("'", "")
-
-        if 'values_changed' in diff_result:
-            for item in diff_result['values_changed']:
-                path = format_path(item.path())
+        for op, path, old, new in changes:
+            if op == 'changed':
                 click.secho(f"~ Modified: {path}", fg='yellow', nl=False)
                 click.echo(
-                    f" from {click.style(str(item.t1), fg='red')} "
-                    f"to {click.style(str(item.t2), fg='green')}"
+                    f" from {click.style(str(old), fg='red')} "
+                    f"to {click.style(str(new), fg='green')}"
                 )
-        if 'iterable_item_added' in diff_result:
-            for item in diff_result['iterable_item_added']:
-                path = format_path(item.path())
-                click.secho(f"+ Added:    {path} with value {item.t2}", fg='green')
-        if 'iterable_item_removed' in diff_result:
-            for item in diff_result['iterable_item_removed']:
-                path = format_path(item.path())
-                click.secho(f"- Removed:  {path} with value {item.t1}", fg='red')
+            elif op == 'added':
+                click.secho(f"+ Added:    {path} with value {new}", fg='green')
+            else:
+                click.secho(f"- Removed:  {path} with value {old}", fg='red')
 
     except (click.ClickException, FileNotFoundError, yaml.YAMLError) as e:
         click.secho(str(e), fg="red")